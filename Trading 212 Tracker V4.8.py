@@ -2,16 +2,23 @@
 # Complete file with all methods included, migrated to SQLite for most JSON files
 
 import os
+import sys
 import json
+import logging
+import re
 import time
 import threading
 import base64
 import sqlite3
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog, messagebox, BOTH, X, LEFT, RIGHT, Y, EW, NS
@@ -32,7 +39,6 @@ try:
     import matplotlib.dates as mdates
     import matplotlib.text as mtext
     import matplotlib.patheffects as path_effects
-    import numpy as np
     MATPLOTLIB = True
 except ImportError:
     MATPLOTLIB = False
@@ -48,6 +54,17 @@ try:
 except ImportError:
     YFINANCE_AVAILABLE = False
     print("yfinance not installed → watchlist price fetching disabled. Install with: pip install yfinance")
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 # ────────────────────────────────────────────────
 # CONFIG
 # ────────────────────────────────────────────────
@@ -55,11 +72,17 @@ APP_NAME = "Trading212 Portfolio Pro v4.8 (REV: 33)"
 DATA_DIR = "data"
 DB_FILE = os.path.join(DATA_DIR, "portfolio.db")
 CSV_FILE = os.path.join(DATA_DIR, "transactions.csv")
+PARQUET_FILE = os.path.join(DATA_DIR, "transactions.parquet")
 NOTES_FILE = os.path.join(DATA_DIR, "notes.json")
 BASE_URL = "https://live.trading212.com/api/v0"
 CACHE_TTL = 30
+HTTP_POOL_SIZE = 4
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUSES = (429, 502, 503, 504)
 AUTO_REFRESH_INTERVAL_SEC = 60
 MAX_BAR_TICKERS = 25
+MIN_REDRAW_INTERVAL_SEC = 0.5
 STALE_THRESHOLD_MIN = 10
 CONCENTRATION_THRESHOLD_PCT = 25
 ZERO_PL_THRESHOLD = 0.001
@@ -68,7 +91,20 @@ CHART_DOWNSAMPLE_THRESHOLD = 3000
 ANOMALY_THRESHOLD_ABS = 2.0
 ANOMALY_THRESHOLD_PCT = 0.02
 NETGAIN_SMOOTH_WINDOW = 5
+FEE_COL_RE = re.compile(r'fee|tax|stamp|commission')  # matched against lowercased CSV headers
+# Substitutions applied to the lowercased CSV action to get the stored Type (part of the dedup key – don't change)
+TYPE_PATTERNS = {
+    r'(?i)buy|market buy': 'Buy',
+    r'(?i)sell|market sell': 'Sell',
+    r'(?i)deposit': 'Deposit',
+    r'(?i)withdrawal': 'Withdrawal',
+    r'(?i)dividend': 'Dividend'
+}
+LOG_LEVEL = os.environ.get("T212_LOG_LEVEL", "INFO").upper()
 os.makedirs(DATA_DIR, exist_ok=True)
+logging.basicConfig(format="%(levelname)s: %(message)s")  # root stays at WARNING for matplotlib/urllib3/PIL
+log = logging.getLogger("trading212")
+log.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
 # ────────────────────────────────────────────────
 # SQLITE HELPERS
 # ────────────────────────────────────────────────
@@ -93,9 +129,12 @@ def init_database():
             CREATE TABLE IF NOT EXISTS cache (
                 id INTEGER PRIMARY KEY CHECK (id = 1),
                 ts REAL,
-                positions_json TEXT
+                positions_json TEXT,
+                cash REAL
             )
         """)
+        if 'cash' not in [row[1] for row in c.execute("PRAGMA table_info(cache)")]:
+            c.execute("ALTER TABLE cache ADD COLUMN cash REAL")
         # Min max
         c.execute("""
             CREATE TABLE IF NOT EXISTS min_max (
@@ -183,18 +222,31 @@ init_database()
 # ────────────────────────────────────────────────
 # PERSISTENCE HELPERS
 # ────────────────────────────────────────────────
+def json_loads(data):
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+def json_dumps(data) -> str:
+    return orjson.dumps(data).decode() if ORJSON_AVAILABLE else json.dumps(data)
+
+def atomic_write(path: str, data: bytes):
+    """Write via a temp file + os.replace so a crash mid-write never leaves a truncated file"""
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
 def load_settings() -> Dict:
     with get_db_connection() as conn:
         row = conn.execute("SELECT value FROM settings WHERE key = 'credentials'").fetchone()
         if row:
             try:
-                return json.loads(row['value'])
+                return json_loads(row['value'])
             except:
                 pass
     return {}
 
 def save_settings(data: Dict):
-    json_str = json.dumps(data)
+    json_str = json_dumps(data)
     with get_db_connection() as conn:
         conn.execute(
             "INSERT OR REPLACE INTO settings (key, value) VALUES ('credentials', ?)",
@@ -210,7 +262,10 @@ class ApiCredentials:
     key: str = ""
     secret: str = ""
 
-@dataclass
+# __slots__ dataclasses need Python 3.10+
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**DATACLASS_SLOTS)
 class Position:
     ticker: str
     quantity: float
@@ -236,25 +291,26 @@ class Cache:
     @staticmethod
     def load() -> Optional[Dict]:
         with get_db_connection() as conn:
-            row = conn.execute("SELECT ts, positions_json FROM cache WHERE id = 1").fetchone()
+            row = conn.execute("SELECT ts, positions_json, cash FROM cache WHERE id = 1").fetchone()
             if row:
                 try:
-                    positions = json.loads(row['positions_json'])
-                    return {'ts': row['ts'], 'positions': positions}
+                    positions = json_loads(row['positions_json'])
+                    return {'ts': row['ts'], 'positions': positions, 'cash': row['cash']}
                 except:
                     pass
         return None
 
     @staticmethod
-    def save(data: List[Dict]):
-        positions_json = json.dumps(data)
+    def save(data: List[Dict], cash: Optional[float] = None) -> Dict:
+        positions_json = json_dumps(data)
         ts = time.time()
         with get_db_connection() as conn:
             conn.execute(
-                "INSERT OR REPLACE INTO cache (id, ts, positions_json) VALUES (1, ?, ?)",
-                (ts, positions_json)
+                "INSERT OR REPLACE INTO cache (id, ts, positions_json, cash) VALUES (1, ?, ?, ?)",
+                (ts, positions_json, cash)
             )
             conn.commit()
+        return {'ts': ts, 'positions': data, 'cash': cash}
 
     @staticmethod
     def is_valid(cache: Optional[Dict]) -> bool:
@@ -323,13 +379,13 @@ def load_all_instruments() -> List[Dict]:
         row = conn.execute("SELECT data_json FROM all_instruments WHERE id = 1").fetchone()
         if row and row['data_json']:
             try:
-                return json.loads(row['data_json'])
+                return json_loads(row['data_json'])
             except:
                 pass
     return []
 
 def save_all_instruments(data: List[Dict]):
-    json_str = json.dumps(data, indent=2)
+    json_str = json_dumps(data)
     with get_db_connection() as conn:
         conn.execute("""
             INSERT OR REPLACE INTO all_instruments (id, data_json)
@@ -389,28 +445,63 @@ def log_anomaly(now_ts: float, prev_assets: float, new_assets: float, net_gain:
             )
         """)
         conn.commit()
-    print(f"ANOMALY LOGGED → {iso_time} | change £{change_abs:+.2f} ({change_pct * 100:+.2f}%) | {reason}")
+    log.info("ANOMALY LOGGED → %s | change £%+.2f (%+.2f%%) | %s", iso_time, change_abs, change_pct * 100, reason)
 
 # ────────────────────────────────────────────────
 # TRANSACTIONS REPOSITORY
 # ────────────────────────────────────────────────
 class TransactionsRepo:
+    NUMERIC_COLS = ['Quantity', 'Price', 'Total', 'Fee', 'FX_Rate', 'Result']
+    CATEGORY_COLS = ['Type', 'Ticker', 'Currency']
     def __init__(self):
         self.path = CSV_FILE
+        self.parquet_path = PARQUET_FILE
     def load(self) -> pd.DataFrame:
         if not os.path.exists(self.path):
             return pd.DataFrame()
-        try:
-            df = pd.read_csv(self.path, parse_dates=['Date'])
-        except:
-            return pd.DataFrame()
-        numeric = ['Quantity', 'Price', 'Total', 'Fee', 'FX_Rate', 'Result']
-        for c in numeric:
+        df = None
+        if self._parquet_is_fresh():
+            try:
+                df = pd.read_parquet(self.parquet_path)
+            except:
+                pass
+        if df is None:
+            try:
+                df = read_csv_fast(self.path, column_types=self._arrow_column_types(), parse_dates=['Date'])
+            except:
+                return pd.DataFrame()
+            df = self._normalize(df)
+            self._save_parquet(df)
+        return df
+    def save(self, df: pd.DataFrame):
+        atomic_write(self.path, df.to_csv(index=False, date_format='%Y-%m-%d %H:%M:%S').encode('utf-8'))
+        self._save_parquet(df)
+    def _normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        if 'Date' in df.columns:  # parse_dates leaves the column as text if any cell is malformed
+            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+        for c in self.NUMERIC_COLS:
             if c in df.columns:
                 df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+        for c in self.CATEGORY_COLS:
+            if c in df.columns:
+                df[c] = df[c].astype('category')
         return df
-    def save(self, df: pd.DataFrame):
-        df.to_csv(self.path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+    def _arrow_column_types(self) -> Optional[Dict]:
+        if not PYARROW_AVAILABLE:
+            return None
+        types = {c: pa.float64() for c in self.NUMERIC_COLS}
+        types['Date'] = pa.timestamp('s')
+        return types
+    def _parquet_is_fresh(self) -> bool:
+        return (PYARROW_AVAILABLE and os.path.exists(self.parquet_path)
+                and os.path.getmtime(self.parquet_path) >= os.path.getmtime(self.path))
+    def _save_parquet(self, df: pd.DataFrame):
+        if not PYARROW_AVAILABLE:
+            return
+        try:
+            atomic_write(self.parquet_path, self._normalize(df.copy()).to_parquet(index=False))
+        except Exception as e:
+            log.warning("Parquet cache write failed: %s", e)
     @staticmethod
     def deduplicate(df: pd.DataFrame) -> pd.DataFrame:
         key = ['Date', 'Type', 'Ticker', 'Total', 'Reference']
@@ -426,6 +517,82 @@ def safe_float(value) -> float:
         return float(value) if value is not None else 0.0
     except:
         return 0.0
+def summarize_positions(positions: List[Position]) -> Dict:
+    """One pass over the positions: open count, largest share, active holdings by value and the value/P&L/cost totals"""
+    num_pos = 0
+    max_pct = 0.0
+    total_value = total_pl = total_cost = 0.0
+    active = []
+    for p in positions:
+        total_value += p.est_value
+        total_pl += p.unrealised_pl
+        total_cost += p.total_cost
+        if p.quantity > 0:
+            num_pos += 1
+            if p.portfolio_pct > max_pct:
+                max_pct = p.portfolio_pct
+            if p.est_value > 0:
+                active.append(p)
+    active.sort(key=lambda x: -x.est_value)
+    return {'num_pos': num_pos, 'max_pct': max_pct, 'active': active,
+            'total_value': total_value, 'total_pl': total_pl, 'total_cost': total_cost}
+POSITION_NUMERIC_FIELDS = ('quantity', 'avg_price', 'current_price', 'est_value', 'unrealised_pl', 'total_cost', 'portfolio_pct')
+def position_arrays(positions: List[Position]) -> Dict[str, np.ndarray]:
+    """Column-wise (one numpy array per field) copy of the positions for vectorised maths"""
+    n = len(positions)
+    arr = {f: np.fromiter((getattr(p, f) for p in positions), dtype=float, count=n) for f in POSITION_NUMERIC_FIELDS}
+    arr['ticker'] = np.array([p.ticker for p in positions], dtype=object)
+    return arr
+def read_csv_fast(path: str, encoding: str = 'utf-8', column_types: Optional[Dict] = None, **pandas_kwargs) -> pd.DataFrame:
+    """Multi-threaded pyarrow CSV reader when available; pandas (with pandas_kwargs) otherwise or on failure.
+    pyarrow rejects rows with the wrong field count, which sends the file to pandas so short rows are NaN-padded as before"""
+    if PYARROW_AVAILABLE:
+        try:
+            table = pacsv.read_csv(
+                path,
+                read_options=pacsv.ReadOptions(encoding=encoding),
+                convert_options=pacsv.ConvertOptions(column_types=column_types or {}, strings_can_be_null=True)
+            )
+            return table.to_pandas()
+        except Exception as e:
+            log.debug("pyarrow CSV read failed, falling back to pandas: %s", e)
+    return pd.read_csv(path, encoding=encoding, **pandas_kwargs)
+def type_mask(types: pd.Series, keyword: str) -> pd.Series:
+    """Case-insensitive substring match – categoricals are matched once per category"""
+    if isinstance(types.dtype, pd.CategoricalDtype):
+        hits = types.cat.categories.astype(str).str.contains(keyword, case=False, regex=False)
+        return types.cat.codes.isin(np.flatnonzero(hits))
+    return types.str.contains(keyword, case=False, regex=False, na=False)
+def dedup_keys(frame: pd.DataFrame, cols: List[str]) -> pd.Series:
+    """Row hash over cols for import dedup. hash_pandas_object hashes raw bytes, so dtypes are unified
+    first – otherwise 250 (int64) vs 250.0 or a [s] vs [ns] Date would never match"""
+    keys = {}
+    for c in cols:
+        col = frame[c]
+        if c == 'Date' or pd.api.types.is_datetime64_any_dtype(col):
+            col = pd.to_datetime(col, errors='coerce').astype('datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            col = col.astype('float64') + 0.0  # + 0.0 folds -0.0 into 0.0
+        keys[c] = col
+    return pd.util.hash_pandas_object(pd.DataFrame(keys, index=frame.index), index=False)
+TX_TYPE_TAGS = ('buy', 'sell', 'dividend')
+# Treeview tags per [row parity][type tag code], built once so rendering never assembles tag lists
+TX_ROW_TAGS = tuple(
+    tuple((parity,) + ((t,) if t else ()) for t in ('',) + TX_TYPE_TAGS)
+    for parity in ('even', 'odd')
+)
+def type_tag_codes(types: pd.Series) -> np.ndarray:
+    """Per-row index into ('',) + TX_TYPE_TAGS – resolved once per category instead of per row"""
+    if not isinstance(types.dtype, pd.CategoricalDtype):
+        types = types.astype('category')
+    names = types.cat.categories.astype(str).str.lower()
+    code_by_cat = np.array([next((i for i, t in enumerate(TX_TYPE_TAGS, 1) if t in n), 0) for n in names] + [0])
+    return code_by_cat[types.cat.codes.to_numpy()]  # code -1 (missing) lands on the trailing 0
+def normalize_types(types: pd.Series) -> pd.Series:
+    """Lowercase + TYPE_PATTERNS, run once per distinct action instead of on every cell"""
+    t = types.astype(str).str.lower()
+    uniq = t.unique()
+    return t.map(dict(zip(uniq, pd.Series(uniq).replace(TYPE_PATTERNS, regex=True))))
 def round_money(val: float) -> float:
     return round(val, 2)
 def format_price(price: float) -> str:
@@ -463,7 +630,7 @@ def get_current_price_yf(symbol: str) -> Optional[float]:
             return float(price)
         return None
     except Exception as e:
-        print(f"yfinance error for {symbol}: {e}")
+        log.warning("yfinance error for %s: %s", symbol, e)
         return None
 # ────────────────────────────────────────────────
 # TRADING212 SERVICE
@@ -471,71 +638,99 @@ def get_current_price_yf(symbol: str) -> Optional[float]:
 class Trading212Service:
     def __init__(self, creds: ApiCredentials):
         self.creds = creds
+        self.auth_headers = self._headers()
         self.session = requests.Session()
-        self.session.headers.update(self._headers())
+        self.session.headers.update(self.auth_headers)
+        retry = Retry(
+            total=HTTP_MAX_RETRIES,
+            backoff_factor=HTTP_BACKOFF_FACTOR,
+            status_forcelist=HTTP_RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self._mem_cache: Optional[Dict] = None
     def _headers(self):
         if not self.creds.key or not self.creds.secret:
             return {}
         token = base64.b64encode(f"{self.creds.key}:{self.creds.secret}".encode()).decode()
         return {"Authorization": f"Basic {token}"}
+    def _require_credentials(self):
+        if not self.auth_headers:
+            raise RuntimeError("No credentials configured")
+    def invalidate_cache(self):
+        self._mem_cache = None
+    def fetch_snapshot(self) -> Tuple[List[Position], float]:
+        """Positions + cash from one cache snapshot; on a miss both are fetched live in parallel"""
+        cache = self._mem_cache if Cache.is_valid(self._mem_cache) else Cache.load()
+        if Cache.is_valid(cache) and cache.get('cash') is not None:
+            self._mem_cache = cache
+            return [Position(**p) for p in cache['positions']], cache['cash']
+        self._require_credentials()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            positions_future = pool.submit(self.fetch_positions)
+            cash_future = pool.submit(self._fetch_cash)
+            positions = positions_future.result()
+            cash = cash_future.result()
+        # a failed cash call is not cached, so the next refresh retries it
+        self._mem_cache = Cache.save([asdict(p) for p in positions], cash)
+        return positions, cash if cash is not None else 0.0
     def fetch_positions(self) -> List[Position]:
-        cache = Cache.load()
-        if Cache.is_valid(cache):
-            return [Position(**p) for p in cache['positions']]
+        self._require_credentials()
         try:
             r = self.session.get(f"{BASE_URL}/equity/positions", timeout=12)
             r.raise_for_status()
-            items = r.json()
+            items = json_loads(r.content)
         except Exception as e:
             raise RuntimeError(f"Positions API failed: {str(e)}")
-        positions = []
-        total_value = 0.0
-        for pos in items:
-            try:
-                instr = pos.get('instrument', {})
-                ticker = instr.get('ticker', '').split('_')[0].upper().rstrip('L')
-                qty = safe_float(pos.get('quantity'))
-                avg_price = safe_float(pos.get('averagePricePaid'))
-                current_price = safe_float(pos.get('currentPrice'))
-                w = pos.get('walletImpact', {}) or {}
-                est_value = safe_float(w.get('currentValue'))
-                api_pl = safe_float(w.get('unrealizedProfitLoss'))
-                total_cost = safe_float(w.get('totalCost'))
-                if api_pl == 0 and qty != 0 and abs(current_price - avg_price) > 0.001:
-                    api_pl = (current_price - avg_price) * qty
-                unrealised_pl = 0.0 if abs(api_pl) < ZERO_PL_THRESHOLD else round_money(api_pl)
-                est_value = 0.0 if abs(est_value) < ZERO_PL_THRESHOLD else round_money(est_value)
-                total_cost = round_money(total_cost)
-                positions.append(Position(
-                    ticker=ticker, quantity=qty, avg_price=avg_price,
-                    current_price=current_price, est_value=est_value,
-                    unrealised_pl=unrealised_pl, total_cost=total_cost
-                ))
-                total_value += est_value
-            except:
-                continue
-        for p in positions:
-            p.portfolio_pct = (p.est_value / total_value * 100) if total_value > 0 else 0
-        Cache.save([p.__dict__ for p in positions])
-        return positions
-    def fetch_cash_balance(self) -> float:
+        return self._parse_positions(items)
+    @staticmethod
+    def _parse_positions(items: List[Dict]) -> List[Position]:
+        items = [pos for pos in items if isinstance(pos, dict)]
+        if not items:
+            return []
+        df = pd.json_normalize(items)
+        tickers = df.get('instrument.ticker', pd.Series('', index=df.index)).fillna('').astype(str)
+        tickers = tickers.str.partition('_')[0].str.upper().str.rstrip('L')
+        num = df.reindex(columns=[
+            'quantity', 'averagePricePaid', 'currentPrice',
+            'walletImpact.currentValue', 'walletImpact.unrealizedProfitLoss', 'walletImpact.totalCost'
+        ]).apply(pd.to_numeric, errors='coerce').fillna(0.0).astype('float64').to_numpy()
+        qty, avg_price, current_price, est_value, api_pl, total_cost = num.T
+        fallback = (api_pl == 0) & (qty != 0) & (np.abs(current_price - avg_price) > 0.001)
+        api_pl = np.where(fallback, (current_price - avg_price) * qty, api_pl)
+        # round_money per value: ndarray.round(2) rounds differently and shifts some pennies
+        unrealised_pl = np.where(np.abs(api_pl) < ZERO_PL_THRESHOLD, 0.0, [round_money(v) for v in api_pl.tolist()])
+        est_value = np.where(np.abs(est_value) < ZERO_PL_THRESHOLD, 0.0, [round_money(v) for v in est_value.tolist()])
+        total_cost = np.array([round_money(v) for v in total_cost.tolist()])
+        total_value = sum(est_value.tolist())  # left-to-right, like the per-position loop it replaced
+        portfolio_pct = est_value / total_value * 100 if total_value > 0 else np.zeros_like(est_value)
+        return [
+            Position(*row) for row in zip(
+                tickers.tolist(), qty.tolist(), avg_price.tolist(), current_price.tolist(),
+                est_value.tolist(), unrealised_pl.tolist(), total_cost.tolist(), portfolio_pct.tolist()
+            )
+        ]
+    def _fetch_cash(self) -> Optional[float]:
+        self._require_credentials()
         try:
             r = self.session.get(f"{BASE_URL}/equity/account/cash", timeout=8)
             r.raise_for_status()
-            data = r.json()
+            data = json_loads(r.content)
             for k in ['free', 'freeCash', 'cash', 'available']:
                 if (val := data.get(k)) is not None:
                     return round_money(safe_float(val))
             return 0.0
         except:
-            return 0.0
+            return None
     def fetch_instruments(self) -> List[Dict]:
         try:
             r = self.session.get(f"{BASE_URL}/equity/metadata/instruments", timeout=60)
             r.raise_for_status()
-            return r.json()
+            return json_loads(r.content)
         except Exception as e:
-            print(f"Instruments fetch failed: {str(e)}")
+            log.error("Instruments fetch failed: %s", e)
             return []
     def request_history_export(self, time_from: str, time_to: str) -> int:
         payload = {
@@ -587,7 +782,7 @@ class Analytics:
             }
         fees = float(df['Fee'].sum()) if 'Fee' in df.columns else 0.0
         realised = float(df['Result'].sum()) if 'Result' in df.columns else 0.0
-        deposit_mask = df['Type'].str.contains('deposit', case=False, na=False)
+        deposit_mask = type_mask(df['Type'], 'deposit')
         deposits = float(df.loc[deposit_mask, 'Total'].sum())
         dep_count = int(deposit_mask.sum())
         hv = sum(p.est_value for p in positions)
@@ -597,11 +792,8 @@ class Analytics:
         ttm_div = 0.0
         if 'Date' in df.columns and 'Type' in df.columns and 'Result' in df.columns:
             one_yr_ago = datetime.now() - timedelta(days=365)
-            ttm_div = float(df[
-                (df['Date'] >= one_yr_ago) &
-                df['Type'].str.contains('dividend', case=False, na=False) &
-                (df['Result'] > 0)
-            ]['Result'].sum())
+            div_mask = type_mask(df['Type'], 'dividend') & (df['Date'] >= one_yr_ago) & (df['Result'] > 0)
+            ttm_div = float(df.loc[div_mask, 'Result'].sum())
         return {
             'total_assets': ta, 'holdings_value': hv, 'net_gain': ng,
             'total_return_pct': tr_pct, 'realised_pl': realised, 'fees': fees,
@@ -617,9 +809,15 @@ class Trading212App:
         self.root.state('zoomed')
         self.repo = TransactionsRepo()
         self.df = self.repo.load()
+        self._tx_search = None  # (df, lowercased row text) backing the transactions filter
+        self._tx_last_filter = None  # (df, filter text, matching row positions) for refining as you type
+        self._tx_totals = None  # (df, formatted TOTAL row)
+        self._tx_rendered = None  # (df, filter text) currently shown in the transactions tree
         self.creds = Secrets.load()
         self.service = Trading212Service(self.creds)
         self.positions: List[Position] = []
+        self.pos_summary = summarize_positions(self.positions)  # both recomputed whenever positions are replaced
+        self._pos_arr = position_arrays(self.positions)
         self.cash_balance: float = 0.0
         self.last_refresh_str = "Never"
         self.last_successful_refresh = 0.0
@@ -797,19 +995,28 @@ class Trading212App:
     def _set_total_return_text(self, text: str):
         if "Total Return" in self.card_vars:
             self.card_vars["Total Return"].set(text)
-    def start_cooldown_countdown(self, seconds_left: int):
+    def _set_refresh_status(self, text: str, color: str):
+        self.refresh_label.config(text=text, foreground=color)
+    def start_cooldown_countdown(self):
         if self.countdown_after_id:
             self.root.after_cancel(self.countdown_after_id)
-        if seconds_left <= 0:
+        self._tick_cooldown()
+    def _tick_cooldown(self):
+        self.countdown_after_id = None
+        remaining = self.cooldown_end_time - time.monotonic()
+        if remaining <= 0:
             self._set_total_return_text("Refreshing...")
             self.refresh(async_fetch=True)
             return
-        self.countdown_after_id = self.root.after(1000, lambda: self.start_cooldown_countdown(seconds_left - 1))
+        self._set_total_return_text(f"Wait {int(remaining) + 1}s...")
+        self.countdown_after_id = self.root.after(min(1000, int(remaining * 1000) + 1), self._tick_cooldown)
     def refresh(self, async_fetch: bool = False, is_auto_retry: bool = False):
         def _task():
             try:
-                self.root.after(0, lambda: self._set_total_return_text("Refreshing..."))
-                self.positions = self.service.fetch_positions()
+                self.root.after(0, self._set_total_return_text, "Refreshing...")
+                self.positions, cash_balance = self.service.fetch_snapshot()
+                self.pos_summary = summarize_positions(self.positions)
+                self._pos_arr = position_arrays(self.positions)
                 min_max = load_min_max()
                 price_hist = load_price_history()
                 now_ts = time.time()
@@ -832,9 +1039,9 @@ class Trading212App:
                     price_hist[t].append({"ts": now_ts, "price": round_money(c)})
                 save_min_max(min_max)
                 save_price_history(price_hist)
-                self.cash_balance = self.service.fetch_cash_balance()
+                self.cash_balance = cash_balance
                 self.last_successful_refresh = time.time()
-                self.cooldown_end_time = time.time() + self.MIN_REFRESH_GAP
+                self.cooldown_end_time = time.monotonic() + self.MIN_REFRESH_GAP
                 self.next_auto_refresh_time = time.time() + AUTO_REFRESH_INTERVAL_SEC
                 summary = Analytics.calculate(self.df, self.positions, self.cash_balance)
                 net_gain_value = summary['net_gain']
@@ -852,27 +1059,24 @@ class Trading212App:
                 hist = load_net_gain_history()
                 hist.append({"ts": now_ts, "net_gain": round(net_gain_value, 2), "total_assets": round(tv, 2)})
                 save_net_gain_history(hist)
-                num_pos = len([p for p in self.positions if p.quantity > 0])
+                pos_summary = self.pos_summary
+                num_pos = pos_summary['num_pos']
                 avg_pos = tv / num_pos if num_pos > 0 else 0
                 cash_pct = (self.cash_balance / tv * 100) if tv > 0 else 0
                 buy_count = sell_count = 0
                 if not self.df.empty:
-                    buy_count = int(self.df['Type'].str.contains('buy', case=False, na=False).sum())
-                    sell_count = int(self.df['Type'].str.contains('sell', case=False, na=False).sum())
+                    buy_count = int(type_mask(self.df['Type'], 'buy').sum())
+                    sell_count = int(type_mask(self.df['Type'], 'sell').sum())
                 session_change_str = ""
                 if self.last_total_assets > 0:
                     ch_pct = ((tv - self.last_total_assets) / self.last_total_assets) * 100
                     arrow = "↑" if ch_pct >= 0 else "↓"
                     session_change_str = f" {arrow} {ch_pct:+.2f}%"
                 self.last_refresh_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.root.after(0, lambda: self._render_dashboard(
-                    summary, num_pos, avg_pos, cash_pct, session_change_str,
-                    buy_count=buy_count, sell_count=sell_count, net_gain=net_gain_value
-                ))
-                self.root.after(0, lambda: self.refresh_label.config(
-                    text=f"Last refresh: {self.last_refresh_str}",
-                    foreground='lime'
-                ))
+                self.root.after(0, self._render_dashboard,
+                                summary, num_pos, avg_pos, cash_pct, session_change_str,
+                                buy_count, sell_count, net_gain_value, pos_summary)
+                self.root.after(0, self._set_refresh_status, f"Last refresh: {self.last_refresh_str}", 'lime')
                 self.root.after(0, self._render_positions)
                 self.root.after(0, self._render_minmax)
                 self.root.after(0, self.render_transactions)
@@ -880,12 +1084,10 @@ class Trading212App:
                 self.root.after(0, self.update_watchlist_prices)
                 self.root.after(0, self.update_countdown)
             except Exception as e:
-                self.root.after(0, lambda: self._set_total_return_text(f"Error: {str(e)}"))
-                self.root.after(0, lambda: self.refresh_label.config(text=f"Error: {str(e)}", foreground='red'))
-        now = time.time()
-        if not is_auto_retry and self.cooldown_end_time > now:
-            rem = int(self.cooldown_end_time - now) + 1
-            self.start_cooldown_countdown(rem)
+                self.root.after(0, self._set_total_return_text, f"Error: {str(e)}")
+                self.root.after(0, self._set_refresh_status, f"Error: {str(e)}", 'red')
+        if not is_auto_retry and self.cooldown_end_time > time.monotonic():
+            self.start_cooldown_countdown()
             return
         if async_fetch:
             threading.Thread(target=_task, daemon=True).start()
@@ -947,20 +1149,29 @@ class Trading212App:
             self.ax3 = self.fig.add_subplot(gs[1, 0])
             self.ax4 = self.fig.add_subplot(gs[1, 1])
             for ax in (self.ax1, self.ax2, self.ax3, self.ax4):
-                ax.set_facecolor('#252535')
-                ax.tick_params(colors='white', labelsize=10.5, pad=6)
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.spines['left'].set_color('gray')
-                ax.spines['bottom'].set_color('gray')
-                ax.grid(True, axis='y', alpha=0.12, color='gray', linestyle='--')
+                self._style_axes(ax, labelsize=10.5, pad=6)
+            self._panel_artists = {}
+            self._panel_bg = {}
+            self._last_alloc_key = None
+            self._last_draw_ts = 0.0
+            self._draw_pending = False
             self.canvas = FigureCanvasTkAgg(self.fig, master=chart_frame)
+            self.canvas.mpl_connect('draw_event', self._on_dashboard_draw)
             self.canvas.get_tk_widget().pack(
                 fill=BOTH,
                 expand=True,
                 padx=0,
                 pady=0
             )
+    def _style_axes(self, ax, **tick_kwargs):
+        """Dark theme for an Axes – needs re-applying after ax.clear()"""
+        ax.set_facecolor('#252535')
+        ax.tick_params(colors='white', **tick_kwargs)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.spines['left'].set_color('gray')
+        ax.spines['bottom'].set_color('gray')
+        ax.grid(True, axis='y', alpha=0.12, color='gray', linestyle='--')
     def smart_pnl_label(self, val: float) -> str:
         if abs(val) < 0.005:
             return "£0.00"
@@ -994,7 +1205,9 @@ class Trading212App:
         
     def _render_dashboard(self, s: Dict, num_pos: int, avg_pos: float, cash_pct: float,
                           session_change_str: str = "", buy_count: int = 0, sell_count: int = 0,
-                          net_gain: float = 0.0):
+                          net_gain: float = 0.0, pos_summary: Optional[Dict] = None):
+        if pos_summary is None:
+            pos_summary = self.pos_summary
         # ── KPI Cards ───────────────────────────────────────────────────────────────
         self.card_vars["Portfolio Value"].set(f"£{round_money(s['holdings_value']):,.2f}")
         self.card_vars["Cash Available"].set(f"£{round_money(self.cash_balance):,.2f} ({cash_pct:.1f}%)")
@@ -1041,7 +1254,7 @@ class Trading212App:
         min_ago = (time.time() - self.last_successful_refresh) / 60 if self.last_successful_refresh else 999
         if min_ago > STALE_THRESHOLD_MIN:
             warnings.append(f"Data stale ({int(min_ago)} min ago)")
-        max_pct = max((p.portfolio_pct for p in self.positions if p.quantity > 0), default=0)
+        max_pct = pos_summary['max_pct']
         if max_pct > CONCENTRATION_THRESHOLD_PCT:
             warnings.append(f"Concentration risk: {max_pct:.1f}% in largest position")
         self.warning_var.set(" • ".join(warnings) if warnings else "")
@@ -1049,145 +1262,187 @@ class Trading212App:
         if not MATPLOTLIB or not self.positions:
             return
 
-        # ── Clear axes ───────────────────────────────────────────────────────────────
-        self.ax1.clear()
-        self.ax2.clear()
-        self.ax3.clear()
-        self.ax4.clear()
-
-        active = [p for p in self.positions if p.est_value > 0 and p.quantity > 0]
+        # active holdings, already sorted by value (largest first)
+        active = pos_summary['active']
+        needs_draw = False
         if not active:
-            for ax, title in zip([self.ax1, self.ax2, self.ax3, self.ax4],
-                                 ["No active positions", "No allocation data",
-                                  "No winners yet", "No losers yet"]):
-                ax.text(0.5, 0.5, title, ha='center', va='center', color='#757575', fontsize=12)
-            self.canvas.draw()
+            for ax, key, title in zip([self.ax1, self.ax2, self.ax3, self.ax4],
+                                      ["top", "alloc", "winners", "losers"],
+                                      ["No active positions", "No allocation data",
+                                       "No winners yet", "No losers yet"]):
+                needs_draw |= self._render_panel_message(ax, key, title, color='#757575')
+            if needs_draw:
+                self._schedule_dashboard_draw()
             return
 
-        sorted_active = sorted(active, key=lambda x: -x.est_value)
-        show_count = min(MAX_BAR_TICKERS, len(sorted_active))
-
         # ── Panel 1: Top Positions by Value ──────────────────────────────────────────
-        sorted_active = sorted(active, key=lambda x: -x.est_value)  # already have this earlier
-        show_count = min(MAX_BAR_TICKERS, len(sorted_active))
-
-        top_positions = sorted_active[:show_count]
+        top_positions = active[:MAX_BAR_TICKERS]
         tickers = [p.ticker for p in top_positions]
         values = [p.est_value for p in top_positions]
 
         # Softer colors based on unrealised P/L (same as before)
         colors = ['#66BB6A' if p.unrealised_pl >= 0 else '#EF5350' for p in top_positions]
 
-        # ── Horizontal bars like Winners / Losers ────────────────────────────────
-        bars = self.ax1.barh(tickers[::-1], values[::-1], color=colors[::-1], height=0.68, zorder=3)
-
-        self.ax1.set_title("Top Positions by Value", fontsize=14, pad=15, color='white', fontweight='medium')
-        self.ax1.invert_yaxis()  # highest on top
-        self.ax1.tick_params(colors='#CCCCCC', labelsize=10)
-
         # Set reasonable x-limit (positive values only)
         max_val = max(values) if values else 1
-        self.ax1.set_xlim(0, max_val * 1.25)
-
-        # Add £ value labels to the right of each bar (no percentage)
-        for bar, val in zip(bars, values[::-1]):
-            label = f"£{round_money(val):,.0f}" if val >= 1000 else f"£{round_money(val):,.1f}"
-            self.ax1.text(
-                val + max_val * 0.025,          # small offset to the right
-                bar.get_y() + bar.get_height()/2,
-                label,
-                va='center', ha='left',
-                fontsize=10,
-                color='#FFFFFF',
-                fontweight='medium',
-                path_effects=[path_effects.withStroke(linewidth=2.2, foreground='#000000')]
-            )
+
+        # £ value labels to the right of each bar (no percentage)
+        labels = [f"£{round_money(v):,.0f}" if v >= 1000 else f"£{round_money(v):,.1f}" for v in values]
+        needs_draw |= self._render_barh_panel(
+            self.ax1, "top", "Top Positions by Value",
+            tickers[::-1], values[::-1], colors[::-1],
+            labels[::-1], [v + max_val * 0.025 for v in values[::-1]],
+            xlim=(0, max_val * 1.25)
+        )
+
         # ── Panel 2: Portfolio Allocation (%) ────────────────────────────────────────
-        alloc_sorted = sorted(active, key=lambda x: -x.portfolio_pct)[:12]
-        alloc_labels = [p.ticker for p in alloc_sorted]
-        alloc_sizes = [p.portfolio_pct for p in alloc_sorted]
-
-        # Use softer, more modern gradient (blues instead of pure gray)
-        alloc_colors = plt.cm.Blues(np.linspace(0.35, 0.85, len(alloc_labels)))
-
-        bars = self.ax2.barh(alloc_labels[::-1], alloc_sizes[::-1], color=alloc_colors, height=0.68, zorder=3)
-        self.ax2.set_title("Portfolio Allocation (%)", fontsize=14, pad=15, color='white', fontweight='medium')
-        self.ax2.invert_yaxis()
-        self.ax2.set_xlim(0, max(alloc_sizes + [1]) * 1.18)
-        self.ax2.tick_params(colors='#CCCCCC', labelsize=10)
-
-        # Add % labels inside bars (cleaner look)
-        for bar, size in zip(bars, alloc_sizes[::-1]):
-            width = bar.get_width()
-            self.ax2.text(
-                width + 0.4,                    # slight offset from bar end
-                bar.get_y() + bar.get_height()/2,
-                f"{size:.1f}%",
-                va='center', ha='left',
-                fontsize=9.5, color='#FFFFFF',
-                fontweight='medium',
-                path_effects=[path_effects.withStroke(linewidth=1.8, foreground='#000000')]
+        alloc_sorted = active[:12]  # portfolio_pct is proportional to est_value
+        # Labels show one decimal, so skip the panel until a share moves by at least 0.1%
+        alloc_key = tuple((p.ticker, round(p.portfolio_pct, 1)) for p in alloc_sorted)
+        if alloc_key != self._last_alloc_key or "alloc" not in self._panel_artists:
+            alloc_labels = [p.ticker for p in alloc_sorted]
+            alloc_sizes = [p.portfolio_pct for p in alloc_sorted]
+
+            # Use softer, more modern gradient (blues instead of pure gray)
+            alloc_colors = list(plt.cm.Blues(np.linspace(0.35, 0.85, len(alloc_labels))))
+
+            needs_draw |= self._render_barh_panel(
+                self.ax2, "alloc", "Portfolio Allocation (%)",
+                alloc_labels[::-1], alloc_sizes[::-1], alloc_colors,
+                [f"{size:.1f}%" for size in alloc_sizes[::-1]],
+                [size + 0.4 for size in alloc_sizes[::-1]],   # slight offset from bar end
+                xlim=(0, max(alloc_sizes + [1]) * 1.18),
+                fontsize=9.5, stroke=1.8
             )
+            self._last_alloc_key = alloc_key
 
         # ── Panel 3: Top Winners (£) ─────────────────────────────────────────────────
         winners = sorted([p for p in active if p.unrealised_pl > 0], key=lambda x: -x.unrealised_pl)[:5]
         if winners:
             win_tickers = [p.ticker for p in winners]
             win_pl = [p.unrealised_pl for p in winners]
-            
-            # Softer positive green
-            self.ax3.barh(win_tickers[::-1], win_pl[::-1], color='#4CAF50', height=0.68, zorder=3)
-            self.ax3.set_title("Top Winners (£)", fontsize=14, pad=15, color='white', fontweight='medium')
-            self.ax3.invert_yaxis()
             max_win = max(win_pl, default=1)
-            self.ax3.set_xlim(0, max_win * 1.25)
-            
-            for i, v in enumerate(win_pl[::-1]):
-                label = self.format_exact_pnl(v)   # already has £
-                self.ax3.text(
-                    v + max_win * 0.025,
-                    i,
-                    label,
-                    va='center', ha='left',
-                    fontsize=10,
-                    color='#FFFFFF',
-                    fontweight='medium',
-                    path_effects=[path_effects.withStroke(linewidth=2.2, foreground='#000000')]
-                )
+
+            # Softer positive green
+            needs_draw |= self._render_barh_panel(
+                self.ax3, "winners", "Top Winners (£)",
+                win_tickers[::-1], win_pl[::-1], ['#4CAF50'] * len(win_pl),
+                [self.format_exact_pnl(v) for v in win_pl[::-1]],   # already has £
+                [v + max_win * 0.025 for v in win_pl[::-1]],
+                xlim=(0, max_win * 1.25)
+            )
         else:
-            self.ax3.text(0.5, 0.5, "No winners yet", ha='center', va='center', color='#888888', fontsize=12)
-            self.ax3.set_title("Top Winners (£)", fontsize=14, pad=15, color='white')
+            needs_draw |= self._render_panel_message(self.ax3, "winners", "No winners yet", title="Top Winners (£)")
 
         # ── Panel 4: Top Losers (£) ──────────────────────────────────────────────────
         losers = sorted([p for p in active if p.unrealised_pl < 0], key=lambda x: x.unrealised_pl)[:5]
         if losers:
             lose_tickers = [p.ticker for p in losers]
             lose_pl = [p.unrealised_pl for p in losers]
-            
-            # Softer negative red
-            self.ax4.barh(lose_tickers[::-1], lose_pl[::-1], color='#E57373', height=0.68, zorder=3)
-            self.ax4.set_title("Top Losers (£)", fontsize=14, pad=15, color='white', fontweight='medium')
-            self.ax4.invert_yaxis()
             max_lose = abs(min(lose_pl, default=-1))
-            self.ax4.set_xlim(min(lose_pl) * 1.25, 0)  # negative side
-            
-            for i, v in enumerate(lose_pl[::-1]):
-                label = self.format_exact_pnl(v)   # already has £
-                self.ax4.text(
-                    v - max_lose * 0.025,
-                    i,
-                    label,
-                    va='center', ha='right',
-                    fontsize=10,
+
+            # Softer negative red
+            needs_draw |= self._render_barh_panel(
+                self.ax4, "losers", "Top Losers (£)",
+                lose_tickers[::-1], lose_pl[::-1], ['#E57373'] * len(lose_pl),
+                [self.format_exact_pnl(v) for v in lose_pl[::-1]],   # already has £
+                [v - max_lose * 0.025 for v in lose_pl[::-1]],
+                xlim=(min(lose_pl) * 1.25, 0),   # negative side
+                ha='right'
+            )
+        else:
+            needs_draw |= self._render_panel_message(self.ax4, "losers", "No losers yet", title="Top Losers (£)")
+
+        if needs_draw:
+            self._schedule_dashboard_draw()
+
+    def _schedule_dashboard_draw(self):
+        """Collapse dashboard redraws requested within MIN_REDRAW_INTERVAL_SEC into one"""
+        if self._draw_pending:
+            return
+        wait = MIN_REDRAW_INTERVAL_SEC - (time.monotonic() - self._last_draw_ts)
+        if wait > 0:
+            self._draw_pending = True
+            self.root.after(int(wait * 1000), self._do_dashboard_draw)
+        else:
+            self._do_dashboard_draw()
+
+    def _do_dashboard_draw(self):
+        self._draw_pending = False
+        self._last_draw_ts = time.monotonic()
+        self.canvas.draw_idle()
+
+    def _render_barh_panel(self, ax, key: str, title: str, tickers: List[str], values: List[float],
+                           colors: List, labels: List[str], label_x: List[float], xlim: tuple,
+                           ha: str = 'left', fontsize: float = 10, stroke: float = 2.2) -> bool:
+        """Horizontal bar panel – bars and labels are updated in place while the tickers stay the same.
+        Returns True when the figure needs a full redraw, False when the panel was blitted."""
+        state = self._panel_artists.get(key)
+        if state is None or state['tickers'] != tickers:
+            ax.clear()
+            self._style_axes(ax)
+            bars = ax.barh(tickers, values, color=colors, height=0.68, zorder=3, animated=True)
+            ax.set_title(title, fontsize=14, pad=15, color='white', fontweight='medium')
+            ax.invert_yaxis()  # highest on top
+            ax.tick_params(colors='#CCCCCC', labelsize=10)
+            texts = [
+                ax.text(
+                    x, i, label,
+                    va='center', ha=ha,
+                    fontsize=fontsize,
                     color='#FFFFFF',
                     fontweight='medium',
-                    path_effects=[path_effects.withStroke(linewidth=2.2, foreground='#000000')]
+                    path_effects=[path_effects.withStroke(linewidth=stroke, foreground='#000000')],
+                    animated=True
                 )
-        else:
-            self.ax4.text(0.5, 0.5, "No losers yet", ha='center', va='center', color='#888888', fontsize=12)
-            self.ax4.set_title("Top Losers (£)", fontsize=14, pad=15, color='white')
-
-        self.canvas.draw()
+                for i, (x, label) in enumerate(zip(label_x, labels))
+            ]
+            ax.set_xlim(*xlim)
+            self._panel_bg.pop(key, None)
+            self._panel_artists[key] = {'ax': ax, 'tickers': tickers, 'bars': list(bars), 'texts': texts, 'xlim': xlim}
+            return True
+        for rect, v, c in zip(state['bars'], values, colors):
+            rect.set_width(v)
+            rect.set_color(c)
+        for text, x, label in zip(state['texts'], label_x, labels):
+            text.set_x(x)
+            text.set_text(label)
+        # Keep the current x-limits only while the freshly computed ones (which include the room left for
+        # label text, not just its anchor) fit inside them – blitting is clipped to ax.bbox
+        old_lo, old_hi = state['xlim']
+        if not (old_lo <= xlim[0] and xlim[1] <= old_hi and old_hi - old_lo <= (xlim[1] - xlim[0]) * 1.2):
+            ax.set_xlim(*xlim)
+            state['xlim'] = xlim
+            self._panel_bg.pop(key, None)
+            return True
+        if key not in self._panel_bg:
+            return True
+        self.canvas.restore_region(self._panel_bg[key])
+        for artist in state['bars'] + state['texts']:
+            ax.draw_artist(artist)
+        self.canvas.blit(ax.bbox)
+        return False
+
+    def _on_dashboard_draw(self, event):
+        # Full draws skip animated artists: snapshot each panel's background, then paint its bars on top
+        for key, state in self._panel_artists.items():
+            ax = state['ax']
+            self._panel_bg[key] = self.canvas.copy_from_bbox(ax.bbox)
+            for artist in state['bars'] + state['texts']:
+                ax.draw_artist(artist)
+
+    def _render_panel_message(self, ax, key: str, message: str, title: Optional[str] = None,
+                              color: str = '#888888') -> bool:
+        self._panel_bg.pop(key, None)
+        if (self._panel_artists.pop(key, None) is None and ax.get_title() == (title or "")
+                and ax.texts and ax.texts[0].get_text() == message):
+            return False  # already showing this message
+        ax.clear()
+        self._style_axes(ax)
+        ax.text(0.5, 0.5, message, ha='center', va='center', color=color, fontsize=12)
+        if title:
+            ax.set_title(title, fontsize=14, pad=15, color='white')
+        return True
     # ────────────────────────────────────────────────
     # NET GAIN CHART
     # ────────────────────────────────────────────────
@@ -1210,13 +1465,7 @@ class Trading212App:
             return
         fig = Figure(figsize=(12,6), facecolor='#1e1e2f')
         ax = fig.add_subplot(111)
-        ax.set_facecolor('#252535')
-        ax.tick_params(colors='white')
-        ax.grid(True, axis='y', alpha=0.12, color='gray', linestyle='--')
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.spines['left'].set_color('gray')
-        ax.spines['bottom'].set_color('gray')
+        self._style_axes(ax)
         ax.set_title("Net Gain Over Time (£)", color='white', fontsize=14, pad=15)
         ax.set_xlabel("Date", color='white')
         ax.set_ylabel("Net Gain (£)", color='white')
@@ -1384,30 +1633,52 @@ class Trading212App:
         self.tree_tx.tag_configure('dividend', foreground='#FFCA28')
         self.tree_tx.tag_configure('total', font=('Segoe UI', 10, 'bold'), foreground='#BB86FC')
         self.render_transactions()
+    def _tx_search_text(self) -> pd.Series:
+        """Lowercased text of every row, built once per self.df instead of once per keystroke"""
+        if self._tx_search is None or self._tx_search[0] is not self.df:
+            text = pd.Series('', index=self.df.index)
+            for i, c in enumerate(self.df.columns):
+                text = text + (' ' if i else '') + self.df[c].astype(str).fillna('')
+            self._tx_search = (self.df, text.str.lower())
+        return self._tx_search[1]
     def render_transactions(self):
-        self.tree_tx.delete(*self.tree_tx.get_children())
         filter_text = self.tx_filter_var.get().lower().strip()
+        # the trace fires on any write (paste, focus, refresh) – nothing to do if neither input changed
+        if self._tx_rendered is not None and self._tx_rendered[0] is self.df and self._tx_rendered[1] == filter_text:
+            return
+        self._tx_rendered = (self.df, filter_text)
+        self.tree_tx.delete(*self.tree_tx.get_children())
+        view = self.df
         if filter_text:
-            rows = [
-                (i, r) for i, r in self.df.iterrows()
-                if filter_text in ' '.join(str(v).lower() for v in r)
-            ]
+            search = self._tx_search_text()
+            last = self._tx_last_filter
+            if last is not None and last[0] is self.df and last[1] in filter_text:
+                # the longer text can only match a subset of the previous hits
+                hits = last[2][search.iloc[last[2]].str.contains(filter_text, regex=False, na=False).to_numpy()]
+            else:
+                hits = np.flatnonzero(search.str.contains(filter_text, regex=False, na=False).to_numpy())
+            self._tx_last_filter = (self.df, filter_text, hits)
+            view = view.iloc[hits]
         else:
-            rows = list(self.df.iterrows())
-        for idx, (_, row) in enumerate(rows):
-            values = [row.get(c, '') for c in self.tree_tx['columns']]
-            tags = ['even' if idx % 2 == 0 else 'odd']
-            t = str(row.get('Type','')).lower()
-            if 'buy' in t: tags.append('buy')
-            elif 'sell' in t: tags.append('sell')
-            elif 'dividend' in t: tags.append('dividend')
-            self.tree_tx.insert('', 'end', values=values, tags=tags)
+            self._tx_last_filter = None
+        view = view.reindex(columns=list(self.tree_tx['columns']), fill_value='')
+        codes = type_tag_codes(view['Type']).tolist()
+        rows = [
+            (values, TX_ROW_TAGS[idx & 1][code])
+            for idx, (values, code) in enumerate(zip(view.to_numpy(dtype=object).tolist(), codes))
+        ]
+        _ins = self.tree_tx.insert
+        for values, tags in rows:
+            _ins('', 'end', values=values, tags=tags)
         if not self.df.empty:
-            totals = ["TOTAL", "", "", self.df['Quantity'].sum(), "", self.df['Total'].sum(),
-                      self.df['Fee'].sum(), self.df['Result'].sum(), ""]
-            formatted = [f"{v:,.2f}" if isinstance(v,(int,float)) and i not in [0,1,2,4,8] else v
-                         for i,v in enumerate(totals)]
-            self.tree_tx.insert('', 'end', values=formatted, tags=('total',))
+            self.tree_tx.insert('', 'end', values=self._tx_totals_row(), tags=('total',))
+    def _tx_totals_row(self) -> Tuple:
+        """TOTAL footer, summed in one pass and reused until self.df is replaced"""
+        if self._tx_totals is None or self._tx_totals[0] is not self.df:
+            qty, total, fee, result = self.df[['Quantity', 'Total', 'Fee', 'Result']].sum().tolist()
+            row = ("TOTAL", "", "", f"{qty:,.2f}", "", f"{total:,.2f}", f"{fee:,.2f}", f"{result:,.2f}", "")
+            self._tx_totals = (self.df, row)
+        return self._tx_totals[1]
     # ────────────────────────────────────────────────
     # POSITIONS
     # ────────────────────────────────────────────────
@@ -1435,28 +1706,37 @@ class Trading212App:
         self._render_positions()
     def _render_positions(self):
         self.tree_pos.delete(*self.tree_pos.get_children())
-        sorted_pos = sorted(self.positions, key=lambda x: -x.est_value if x.quantity > 0 else 0)
-        tv = sum(p.est_value for p in sorted_pos)
-        tpl = sum(p.unrealised_pl for p in sorted_pos)
-        tc = sum(p.total_cost for p in sorted_pos)
-        for idx, p in enumerate(sorted_pos):
-            if p.quantity <= 0: continue
-            tags = ['profit' if p.unrealised_pl >= 0 else 'loss', 'even' if idx%2==0 else 'odd']
-            curr_price_str = format_price(p.current_price)
-            avg_price_str = format_price(p.avg_price)
+        arr = self._pos_arr
+        # largest open holdings first; closed ones share key 0 and keep their order (stable sort)
+        order = np.argsort(np.where(arr['quantity'] > 0, -arr['est_value'], 0.0), kind='stable')
+        columns = [arr[f][order] for f in ('ticker', 'quantity', 'avg_price', 'current_price',
+                                           'est_value', 'unrealised_pl', 'total_cost', 'portfolio_pct')]
+        open_rows = np.flatnonzero(columns[1] > 0).tolist()
+        pl_tag = np.where(columns[5] >= 0, 'profit', 'loss').tolist()
+        # back to Python floats: format_price -> round_money must not see np.float64 (numpy rounding differs)
+        ticker, qty, avg, curr, value, pl, cost, pct = (c.tolist() for c in columns)
+        tv, tpl, tc = (self.pos_summary[k] for k in ('total_value', 'total_pl', 'total_cost'))
+        # :.2f rounds the exact binary value just like round_money() does, so money cells skip the pre-round
+        rows = []
+        for idx in open_rows:
+            tags = (pl_tag[idx], 'even' if idx%2==0 else 'odd')
+            curr_price_str = format_price(curr[idx])
+            avg_price_str = format_price(avg[idx])
             vals = (
-                p.ticker,
-                f"{p.quantity:,.4f}",
+                ticker[idx],
+                f"{qty[idx]:,.4f}",
                 avg_price_str,
                 curr_price_str,
-                f"£{round_money(p.est_value):,.2f}",
-                f"£{round_money(p.unrealised_pl):+,.2f}",
-                f"£{round_money(p.total_cost):,.2f}",
-                f"{p.portfolio_pct:.1f}%"
+                f"£{value[idx]:,.2f}",
+                f"£{pl[idx]:+,.2f}",
+                f"£{cost[idx]:,.2f}",
+                f"{pct[idx]:.1f}%"
             )
-            self.tree_pos.insert('', 'end', values=vals, tags=tags)
-        footer = ("TOTAL", "", "", "", f"£{round_money(tv):,.2f}",
-                  f"£{round_money(tpl):+,.2f}", f"£{round_money(tc):,.2f}", "100.0%")
+            rows.append((vals, tags))
+        _ins = self.tree_pos.insert
+        for vals, tags in rows:
+            _ins('', 'end', values=vals, tags=tags)
+        footer = ("TOTAL", "", "", "", f"£{tv:,.2f}", f"£{tpl:+,.2f}", f"£{tc:,.2f}", "100.0%")
         self.tree_pos.insert('', 'end', values=footer, tags=('total',))
     # ────────────────────────────────────────────────
     # HISTORICAL HIGHS & LOWS
@@ -1550,13 +1830,7 @@ class Trading212App:
                 canvas.draw()
                 return
             ax.clear()
-            ax.set_facecolor('#252535')
-            ax.tick_params(colors='white')
-            ax.grid(True, axis='y', alpha=0.12, color='gray', linestyle='--')
-            for spine in ['top', 'right']:
-                ax.spines[spine].set_visible(False)
-            ax.spines['left'].set_color('gray')
-            ax.spines['bottom'].set_color('gray')
+            self._style_axes(ax)
             ax.set_title(f"{ticker} Price History (£)", color='white', fontsize=14, pad=15)
             ax.set_xlabel("Date", color='white')
             ax.set_ylabel("Price (£)", color='white')
@@ -2224,8 +2498,7 @@ class Trading212App:
             "saved_at": datetime.now().isoformat()
         }
         try:
-            with open(NOTES_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            atomic_write(NOTES_FILE, json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'))
             #messagebox.showinfo("Notes", "Notes saved successfully.")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save notes:\n{str(e)}")
@@ -2379,6 +2652,7 @@ class Trading212App:
         with get_db_connection() as conn:
             conn.execute("DELETE FROM cache")
             conn.commit()
+        self.service.invalidate_cache()
         messagebox.showinfo("Cache", "Cache cleared.")
     def clear_transactions(self):
         if messagebox.askyesno("Confirm", "Delete all transactions?"):
@@ -2458,10 +2732,10 @@ class Trading212App:
             df_new = None
             for enc in encodings:
                 try:
-                    raw = pd.read_csv(path, encoding=enc, on_bad_lines='skip')
+                    raw = read_csv_fast(path, encoding=enc, on_bad_lines='skip')
                     if not raw.empty:
                         df_new = raw
-                        print(f"DEBUG: Read CSV with encoding: {enc}")
+                        log.debug("Read CSV with encoding: %s", enc)
                         break
                 except:
                     continue
@@ -2470,7 +2744,7 @@ class Trading212App:
                     content_preview = f.read(500)
                 raise ValueError(f"Cannot parse CSV.\nFile preview:\n{content_preview}")
             df_new.columns = df_new.columns.str.strip().str.lower()
-            print("DEBUG: Columns in downloaded CSV:", list(df_new.columns))
+            log.debug("Columns in downloaded CSV: %s", list(df_new.columns))
             mapping = {
                 'time': 'Date', 'date': 'Date',
                 'action': 'Type', 'type': 'Type',
@@ -2484,45 +2758,45 @@ class Trading212App:
                 'notes': 'Note', 'note': 'Note',
                 'id': 'Reference'
             }
-            processed = pd.DataFrame()
+            columns = list(df_new.columns)  # already stripped + lowercased above
+            sources = {}  # target -> CSV column; later mapping keys override earlier ones
             for old, new in mapping.items():
-                matches = [c for c in df_new.columns if old.lower() in c.lower()]
-                if matches:
-                    processed[new] = df_new[matches[0]]
-            fee_cols = [c for c in df_new.columns if any(word in c.lower() for word in ['fee', 'tax', 'stamp', 'commission'])]
+                match = next((c for c in columns if old in c), None)
+                if match is not None:
+                    sources[new] = match
+            # one subset + relabel instead of a column assignment per target
+            processed = df_new[list(sources.values())].set_axis(list(sources), axis=1) if sources else pd.DataFrame()
+            fee_cols = [c for c in columns if FEE_COL_RE.search(c)]
             processed['Fee'] = df_new[fee_cols].sum(axis=1, numeric_only=True).fillna(0) if fee_cols else 0.0
             if 'Type' in processed.columns:
-                processed['Type'] = processed['Type'].astype(str).str.lower().replace({
-                    r'(?i)buy|market buy': 'Buy',
-                    r'(?i)sell|market sell': 'Sell',
-                    r'(?i)deposit': 'Deposit',
-                    r'(?i)withdrawal': 'Withdrawal',
-                    r'(?i)dividend': 'Dividend'
-                }, regex=True)
+                processed['Type'] = normalize_types(processed['Type'])
             processed['Date'] = pd.to_datetime(processed.get('Date'), errors='coerce')
-            for col in ['Quantity', 'Price', 'Total', 'Fee', 'Result', 'FX_Rate']:
-                if col in processed.columns:
-                    processed[col] = pd.to_numeric(processed[col], errors='coerce').fillna(0)
+            num_cols = [c for c in ('Quantity', 'Price', 'Total', 'Fee', 'Result', 'FX_Rate') if c in processed.columns]
+            processed[num_cols] = processed[num_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
+            processed = processed.fillna({'Ticker': '-', 'Note': ''})  # before keying, stored rows are already filled
             dedup_cols = ['Date', 'Type', 'Ticker', 'Total', 'Reference']
             dedup_cols = [c for c in dedup_cols if c in processed.columns]
-            existing = self.df.copy()
-            if 'Date' in existing.columns:
-                existing['Date'] = pd.to_datetime(existing['Date'], errors='coerce')
+            existing = self.df  # Date is already datetime64, TransactionsRepo normalises it on load
             if not existing.empty and dedup_cols:
-                merged = pd.merge(processed, existing[dedup_cols], how='left', on=dedup_cols, indicator=True)
-                new_rows = merged[merged['_merge'] == 'left_only'].drop(columns='_merge')
+                seen = dedup_keys(existing, dedup_cols)
+                new_rows = processed.loc[~dedup_keys(processed, dedup_cols).isin(seen).to_numpy()]
             else:
-                new_rows = processed.copy()
+                new_rows = processed  # freshly built above, nothing else holds a reference
             if new_rows.empty:
-                print("DEBUG: No new rows after deduplication")
+                log.debug("No new rows after deduplication")
                 return
-            self.df = pd.concat([self.df, new_rows], ignore_index=True)
-            self.df = self.repo.deduplicate(self.df.fillna({'Ticker':'-', 'Note':''}))
-            self.df = self.df.sort_values('Date', ascending=False).reset_index(drop=True)
+            # self.df is already deduplicated and sorted newest first – only the new rows need that work.
+            # The dedup_keys check above is the only guard against re-imported rows, so it must stay dtype-safe
+            new_rows = self.repo.deduplicate(new_rows).sort_values('Date', ascending=False)
+            self.df = pd.concat([new_rows, self.df], ignore_index=True)
+            self.df = self.df.sort_values('Date', ascending=False, kind='mergesort').reset_index(drop=True)
+            for c in TransactionsRepo.CATEGORY_COLS:
+                if c in self.df.columns:
+                    self.df[c] = self.df[c].astype('category')  # concat with the new rows drops the dtype
             self.repo.save(self.df)
-            print(f"DEBUG: Added {len(new_rows)} new rows from recent history")
+            log.debug("Added %d new rows from recent history", len(new_rows))
         except Exception as e:
-            print(f"ERROR during import: {str(e)}")
+            log.error("Error during import: %s", e)
             raise
     def _sort_tree(self, tree, col, reverse):
         data = [(tree.set(k, col), k) for k in tree.get_children('')]
@@ -0,0 +1,20 @@
+import importlib.util
+import os
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Trading 212 Tracker V4.8.py")
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    # the script creates data/portfolio.db relative to the working directory on import
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        spec = importlib.util.spec_from_file_location("t212_app", SCRIPT)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        yield module
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,62 @@
+import types
+
+import pandas as pd
+
+HEADER = "Action,Time,Ticker,No. of shares,Price / share,Total,ID\n"
+FIRST = HEADER + (
+    "Deposit,2024-01-01 09:00:00,,,,1000.00,EOF1\n"
+    "Market buy,2024-01-02 10:00:00,AAPL,2,125.00,250.00,EOF2\n"
+    "Market buy,2024-01-03 10:00:00,MSFT,1,250.00,250.00,EOF3\n"
+)
+# Overlapping export: same trades, but Total written without decimals so the column parses as int64
+SECOND = HEADER + (
+    "Market buy,2024-01-02 10:00:00,AAPL,2,125,250,EOF2\n"
+    "Market buy,2024-01-03 10:00:00,MSFT,1,250,250,EOF3\n"
+    "Market sell,2024-01-04 10:00:00,MSFT,1,260,260,EOF4\n"
+)
+
+
+def make_importer(app, tmp_path):
+    repo = app.TransactionsRepo()
+    repo.path = str(tmp_path / "transactions.csv")
+    repo.parquet_path = str(tmp_path / "transactions.parquet")
+    return types.SimpleNamespace(df=repo.load(), repo=repo)
+
+
+def import_text(app, importer, tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    app.Trading212App._import_csv_from_path(importer, str(path))
+
+
+def test_dedup_keys_ignore_dtype_differences(app):
+    stored = pd.DataFrame({
+        "Date": pd.to_datetime(["2024-01-03 10:00:00"]).astype("datetime64[s]"),
+        "Type": pd.Categorical(["Buy"]),
+        "Total": [250.0],
+        "Reference": [float("nan")],
+    })
+    incoming = pd.DataFrame({
+        "Date": pd.to_datetime(["2024-01-03 10:00:00"]),
+        "Type": ["Buy"],
+        "Total": [250],
+        "Reference": [float("nan")],
+    })
+    cols = list(stored.columns)
+    assert app.dedup_keys(incoming, cols).isin(app.dedup_keys(stored, cols)).all()
+
+
+def test_overlapping_import_with_integer_totals_adds_no_duplicates(app, tmp_path):
+    importer = make_importer(app, tmp_path)
+    import_text(app, importer, tmp_path, "first.csv", FIRST)
+    import_text(app, importer, tmp_path, "second.csv", SECOND)
+    assert len(importer.df) == 4
+    assert sorted(importer.df["Reference"].astype(str)) == ["EOF1", "EOF2", "EOF3", "EOF4"]
+
+
+def test_overlapping_import_after_reload_adds_no_duplicates(app, tmp_path):
+    import_text(app, make_importer(app, tmp_path), tmp_path, "first.csv", FIRST)
+    importer = make_importer(app, tmp_path)  # fresh start: stored rows come back from disk
+    import_text(app, importer, tmp_path, "second.csv", SECOND)
+    assert len(importer.df) == 4
+    assert len(app.TransactionsRepo.load(importer.repo)) == 4
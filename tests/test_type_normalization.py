@@ -0,0 +1,34 @@
+import pandas as pd
+
+# Action strings as they appear in Trading 212 CSV exports
+ACTIONS = [
+    "Market buy", "Market sell", "Limit buy", "Limit sell", "Stop buy", "Stop sell",
+    "Stop limit buy", "Stop limit sell", "Deposit", "Withdrawal",
+    "Dividend (Ordinary)", "Dividend (Dividend)", "Dividend (Bonus)", "Dividend (Return of capital)",
+    "Dividend (Dividends paid by us corporations)", "Dividend (Dividends paid by foreign corporations)",
+    "Dividend (Dividend manufactured payment)", "Dividend (Ordinary manufactured payment)",
+    "Dividend (Tax exempted)", "Dividend (Property income)",
+    "Interest on cash", "Lending interest", "Currency conversion", "Result adjustment",
+    "Buy", "Sell", "Dividend", "BUY", "market BUY",
+]
+
+
+def legacy_normalize(types: pd.Series) -> pd.Series:
+    """The per-cell regex replace earlier imports used to build the stored Type"""
+    return types.astype(str).str.lower().replace({
+        r'(?i)buy|market buy': 'Buy',
+        r'(?i)sell|market sell': 'Sell',
+        r'(?i)deposit': 'Deposit',
+        r'(?i)withdrawal': 'Withdrawal',
+        r'(?i)dividend': 'Dividend'
+    }, regex=True)
+
+
+def test_normalize_types_matches_legacy_replace(app):
+    types = pd.Series(ACTIONS * 3)
+    pd.testing.assert_series_equal(app.normalize_types(types), legacy_normalize(types), check_dtype=False)
+
+
+def test_normalize_types_keeps_missing_values(app):
+    types = pd.Series(["Market buy", None, "Deposit"])
+    pd.testing.assert_series_equal(app.normalize_types(types), legacy_normalize(types), check_dtype=False)